@@ -1,25 +1,45 @@
 import os
+import functools
 from crewai import LLM
 from crewai import Agent, Crew, Task
 from logging_config import get_logger
 
+# Task templates are static; create_crew only has to wire them to the agents
+RESEARCH_TASK = {
+    "description": 'Research: {text}',
+    "expected_output": 'Detailed research findings about the topic',
+}
+SUMMARY_TASK = {
+    "description": 'Write summary',
+    "expected_output": 'Clear and concise summary of the research findings',
+}
+
+@functools.lru_cache(maxsize=1)
+def _get_llm():
+    """
+    The Groq LLM client is stateless configuration, so it is built once and
+    shared. Crews and tasks are not: kickoff() writes inputs and outputs onto
+    them, so create_crew builds those per instance.
+    """
+    # --- SWITCH TO GROQ (Free & Fast) ---
+    return LLM(
+        model="openai/llama-3.1-8b-instant",
+        api_key=os.getenv("GROQ_API_KEY"),
+        base_url="https://api.groq.com/openai/v1"
+    )
+
 class ResearchCrew:
     def __init__(self, verbose=True, logger=None):
         self.verbose = verbose
         self.logger = logger or get_logger(__name__)
         # Note: I removed the misplaced gemini_llm code from here
-        self.crew = self.create_crew() 
+        self.crew = self.create_crew()
         self.logger.info("ResearchCrew initialized")
 
     def create_crew(self):
         self.logger.info("Creating research crew with agents")
-        
-        # --- SWITCH TO GROQ (Free & Fast) ---
-        groq_llm = LLM(
-            model="openai/llama-3.1-8b-instant",
-            api_key=os.getenv("GROQ_API_KEY"),
-            base_url="https://api.groq.com/openai/v1"
-        )
+
+        groq_llm = _get_llm()
 
         researcher = Agent(
             role='Research Analyst',
@@ -42,17 +62,9 @@ class ResearchCrew:
         crew = Crew(
             agents=[researcher, writer],
             tasks=[
-                Task(
-                    description='Research: {text}',
-                    expected_output='Detailed research findings about the topic',
-                    agent=researcher
-                ),
-                Task(
-                    description='Write summary',
-                    expected_output='Clear and concise summary of the research findings',
-                    agent=writer
-                )
+                Task(agent=researcher, **RESEARCH_TASK),
+                Task(agent=writer, **SUMMARY_TASK)
             ]
         )
         self.logger.info("Crew setup completed")
-        return crew
\ No newline at end of file
+        return crew
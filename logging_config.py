@@ -1,10 +1,27 @@
 import os
+import queue
+import atexit
 import logging
-from logging.handlers import RotatingFileHandler
+from logging.handlers import RotatingFileHandler, QueueHandler, QueueListener
+
+# Background listener that owns the file handler (one per process)
+_listener = None
+
+def _stop_listener():
+    """ Flushes queued records on shutdown """
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+atexit.register(_stop_listener)
 
 def setup_logging(log_level=logging.INFO):
     """
     Configure application-wide logging
+
+    Records are handed to a queue and written to disk by a background
+    listener thread, so callers on the event loop never block on file I/O.
     
     Args:
         log_level: The minimum log level to capture (default: INFO)
@@ -34,11 +51,17 @@ def setup_logging(log_level=logging.INFO):
     
     # Remove any existing handlers to prevent duplicates
     for handler in root_logger.handlers[:]:
-        if isinstance(handler, logging.StreamHandler):
+        if isinstance(handler, (logging.StreamHandler, QueueHandler)):
             root_logger.removeHandler(handler)
-    
-    # Add the file handler
-    root_logger.addHandler(file_handler)
+
+    # Route records through a queue; the listener thread writes them to the file
+    global _listener
+    _stop_listener()
+    log_queue = queue.SimpleQueue()
+    _listener = QueueListener(log_queue, file_handler, respect_handler_level=True)
+    _listener.start()
+
+    root_logger.addHandler(QueueHandler(log_queue))
     
     return root_logger
 
@@ -1,9 +1,23 @@
 import os
+import time
+import json
+import asyncio
+import functools
 import uvicorn
 import uuid
+import anyio
+import httpx
+import orjson
+from types import SimpleNamespace
+from contextlib import asynccontextmanager
 from dotenv import load_dotenv
-from fastapi import FastAPI, HTTPException
-from pydantic import BaseModel
+from fastapi import FastAPI, HTTPException, Request, Response
+from decimal import Decimal
+from pydantic import BaseModel, ConfigDict, field_validator
+from redis.asyncio import Redis
+from celery import Celery
+from celery.signals import worker_init
+from async_batcher.batcher import AsyncBatcher
 from masumi.config import Config
 from masumi.payment import Payment, Amount
 from logging_config import setup_logging
@@ -19,31 +33,299 @@ PAYMENT_SERVICE_URL = os.getenv("PAYMENT_SERVICE_URL")
 PAYMENT_API_KEY = os.getenv("PAYMENT_API_KEY")
 NETWORK = os.getenv("NETWORK")
 AGENT_IDENTIFIER = os.getenv("AGENT_IDENTIFIER")
+PAYMENT_AMOUNT = os.getenv("PAYMENT_AMOUNT", "5000000")  # Default 5 ADA
+PAYMENT_UNIT = os.getenv("PAYMENT_UNIT", "lovelace")
+REDIS_URL = os.getenv("REDIS_URL", "redis://localhost:6379/0")
+JOB_TTL_SECONDS = int(os.getenv("JOB_TTL_SECONDS", "86400"))
+FINISHED_JOB_TTL_SECONDS = int(os.getenv("FINISHED_JOB_TTL_SECONDS", str(JOB_TTL_SECONDS)))
+PAYMENT_POLL_MAX_INTERVAL = float(os.getenv("PAYMENT_POLL_MAX_INTERVAL", "900"))
+STATUS_CACHE_TTL = int(os.getenv("STATUS_CACHE_TTL", "1"))
+STATUS_REFRESH_TIMEOUT = float(os.getenv("STATUS_REFRESH_TIMEOUT", "5"))
+PAYMENT_LISTING_TTL = int(os.getenv("PAYMENT_LISTING_TTL", "2"))
+THREADPOOL_SIZE = int(os.getenv("THREADPOOL_SIZE", "200"))
 
 logger.info("Starting application with configuration:")
-logger.info(f"PAYMENT_SERVICE_URL: {PAYMENT_SERVICE_URL}")
-logger.info(f"NETWORK: {NETWORK}")
+logger.info("PAYMENT_SERVICE_URL: %s", PAYMENT_SERVICE_URL)
+logger.info("NETWORK: %s", NETWORK)
+
+async def prewarm(state) -> None:
+    """
+    Opens the Redis pool before traffic arrives and logs whether the payment
+    service is reachable. Failures are logged, never fatal.
+    """
+    try:
+        await state.redis.ping()
+    except Exception as e:
+        logger.warning("Redis prewarm failed: %s", e)
+    try:
+        # masumi opens its own aiohttp session per call, so this only probes reachability
+        async with httpx.AsyncClient(base_url=PAYMENT_SERVICE_URL, timeout=5.0) as client:
+            response = await client.get("/health/")
+        logger.info("Payment service health: %s", response.status_code)
+    except Exception as e:
+        logger.warning("Payment service prewarm failed: %s", e)
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """
+    Builds the per-process clients once and keeps them on app.state; handlers
+    read them from request.app.state. Everything is closed on shutdown so
+    recycled workers do not leak sockets.
+    """
+    # Blocking calls (e.g. Celery publishes) run in anyio's thread pool; give it headroom
+    anyio.to_thread.current_default_thread_limiter().total_tokens = THREADPOOL_SIZE
+
+    app.state.config = build_config()
+    app.state.redis = Redis.from_url(REDIS_URL, decode_responses=True)
+    # One listing answers any number of jobs, so batches are unbounded; the bounded
+    # queue keeps a polling storm from growing memory and overflow just skips the refresh
+    app.state.status_batcher = StatusBatcher(
+        app.state.config, max_batch_size=-1, max_queue_time=0.05, max_queue_size=10_000
+    )
+    await prewarm(app.state)
+    yield
+    try:
+        await app.state.status_batcher.stop(timeout=5)
+    finally:
+        await app.state.redis.aclose()
 
 # Initialize FastAPI
 app = FastAPI(
     title="Aura Network User Agent",
     description="Agent that filters ads based on user preferences and bid amount.",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan
 )
 
 # ─────────────────────────────────────────────────────────────────────────────
-# In-memory storage
+# Storage
 # ─────────────────────────────────────────────────────────────────────────────
-jobs = {}
-payment_instances = {}
+# Job records live in Redis so every worker sees them and they expire on their own.
+# Polling Masumi until a job is paid happens in the Celery worker.
+FINISHED_STATUSES = frozenset({"completed", "failed"})
+
+async def load_job(redis: Redis, job_id: str) -> dict | None:
+    """ Returns the stored job record, or None if it is unknown or expired """
+    raw = await redis.get(f"job:{job_id}")
+    return json.loads(raw) if raw is not None else None
+
+async def save_job(redis: Redis, job_id: str, job: dict) -> None:
+    """
+    Writes the job record back to Redis and refreshes its TTL. Finished jobs
+    use FINISHED_JOB_TTL_SECONDS so their retention can be tuned separately.
+    """
+    ttl = FINISHED_JOB_TTL_SECONDS if job["status"] in FINISHED_STATUSES else JOB_TTL_SECONDS
+    await redis.set(f"job:{job_id}", json.dumps(job), ex=ttl)
 
 # ─────────────────────────────────────────────────────────────────────────────
 # Initialize Masumi Payment Config
 # ─────────────────────────────────────────────────────────────────────────────
-config = Config(
-    payment_service_url=PAYMENT_SERVICE_URL,
-    payment_api_key=PAYMENT_API_KEY
-)
+def build_config() -> Config:
+    """ Masumi config; built once per process (API lifespan or Celery worker) """
+    return Config(
+        payment_service_url=PAYMENT_SERVICE_URL,
+        payment_api_key=PAYMENT_API_KEY
+    )
+
+# Payment amounts charged per job; fixed for the life of the process
+AMOUNTS = (Amount(amount=PAYMENT_AMOUNT, unit=PAYMENT_UNIT),)
+
+def build_payment(config: Config, job: dict) -> Payment:
+    """ Recreates the Masumi Payment for a stored job so any process can poll or complete it """
+    payment = Payment(
+        agent_identifier=AGENT_IDENTIFIER,
+        amounts=AMOUNTS,
+        config=config,
+        identifier_from_purchaser=job["identifier_from_purchaser"],
+        input_data=job["input_data"],
+        network=NETWORK
+    )
+    if job["blockchain_identifier"]:
+        payment.payment_ids.add(job["blockchain_identifier"])
+    return payment
+
+def index_payments(result: dict) -> dict:
+    """ Maps blockchainIdentifier -> payment entry from a check_payment_status response """
+    return {
+        entry.get("blockchainIdentifier"): entry
+        for entry in result.get("data", {}).get("Payments", [])
+    }
+
+class StatusBatcher(AsyncBatcher):
+    """
+    Coalesces concurrent /status refreshes into a single Masumi call.
+    check_payment_status lists every payment on the network, so one
+    request answers the whole batch.
+    """
+    def __init__(self, config: Config, **kwargs):
+        super().__init__(**kwargs)
+        self.config = config
+
+    async def process_batch(self, batch: list) -> list:
+        payment = build_payment(self.config, batch[0])
+        payment.payment_ids.update(job["blockchain_identifier"] for job in batch)
+        payments = index_payments(await payment.check_payment_status())
+        return [payments.get(job["blockchain_identifier"], {}).get("onChainState") for job in batch]
+
+async def refresh_payment_status(state, job_id: str, job: dict) -> str | None:
+    """
+    Returns the job's on-chain payment state, asking Masumi at most once
+    per STATUS_CACHE_TTL seconds per job across all workers. A slow Masumi
+    call is abandoned after STATUS_REFRESH_TIMEOUT so /status stays responsive.
+    """
+    cached = await state.redis.get(f"status:{job_id}")
+    if cached is not None:
+        return cached or None
+
+    on_chain_state = await asyncio.wait_for(state.status_batcher.process(job), STATUS_REFRESH_TIMEOUT)
+    await state.redis.set(f"status:{job_id}", on_chain_state or "", ex=STATUS_CACHE_TTL)
+    return on_chain_state
+
+# ─────────────────────────────────────────────────────────────────────────────
+# Background worker (Celery, Redis broker)
+# Run alongside uvicorn with: celery -A main.celery_app worker -c 8
+# ─────────────────────────────────────────────────────────────────────────────
+celery_app = Celery("agent", broker=REDIS_URL)
+celery_app.conf.task_ignore_result = True
+
+# Masumi states in which the purchaser's funds are locked and the job can run
+PAID_ON_CHAIN_STATES = ("FundsLocked", "Complete")
+PAID_NEXT_ACTIONS = ("PaymentComplete", "None")
+
+# A transient failure (e.g. a Redis blip) retries the task with backoff instead of
+# ending the self-requeueing chain; the job's TTL bounds how long a chain can live.
+WORKER_TASK_OPTIONS = {
+    "autoretry_for": (Exception,),
+    "retry_backoff": True,
+    "retry_backoff_max": int(PAYMENT_POLL_MAX_INTERVAL),
+    "retry_jitter": True,
+    "max_retries": None,
+}
+
+_worker_loop = None
+_worker_state = None
+
+def run_in_worker_loop(coro):
+    """
+    Runs a coroutine on this worker process's event loop. The loop is kept
+    for the life of the process so the Redis connection pool stays usable.
+    """
+    global _worker_loop
+    if _worker_loop is None:
+        _worker_loop = asyncio.new_event_loop()
+    return _worker_loop.run_until_complete(coro)
+
+@worker_init.connect
+def validate_worker_config(**kwargs):
+    """
+    Refuses to start a worker with a broken payment config. Otherwise every
+    task would fail in worker_state() and leave its job stuck. Celery logs and
+    swallows ordinary exceptions from signal handlers, so exit explicitly.
+    """
+    try:
+        build_config()
+    except ValueError as e:
+        logger.critical("Invalid payment configuration: %s", e)
+        raise SystemExit(f"Invalid payment configuration: {e}")
+
+def worker_state():
+    """ The worker's counterpart to app.state: config and Redis client, built once per process """
+    global _worker_state
+    if _worker_state is None:
+        _worker_state = SimpleNamespace(
+            config=build_config(),
+            redis=Redis.from_url(REDIS_URL, decode_responses=True)
+        )
+    return _worker_state
+
+@celery_app.task(name="create_and_monitor", **WORKER_TASK_OPTIONS)
+def create_and_monitor(job_id: str) -> None:
+    """ Creates the Masumi payment request for a queued job, then starts polling it """
+    delay = run_in_worker_loop(request_payment(worker_state(), job_id))
+    if delay is not None:
+        monitor_payment.apply_async((job_id,), countdown=delay)
+
+def next_poll_delay(job: dict) -> float:
+    """
+    Seconds until the next payment check. Starts sub-second and grows with
+    the job's age (5% of elapsed time), capped at PAYMENT_POLL_MAX_INTERVAL,
+    so quick payments are noticed fast and stale ones are polled rarely.
+    """
+    elapsed = time.time() - job["started_at"]
+    return min(PAYMENT_POLL_MAX_INTERVAL, max(0.5, elapsed * 0.05))
+
+async def request_payment(state, job_id: str) -> float | None:
+    """ Returns the delay before the first payment check, or None if the job cannot proceed """
+    job = await load_job(state.redis, job_id)
+    if job is None or job["status"] != "creating_payment_request":
+        return None
+
+    try:
+        logger.info("Creating payment request...")
+        payment_request = await build_payment(state.config, job).create_payment_request()
+    except Exception as e:
+        logger.error("Payment request failed for job %s: %s", job_id, e, exc_info=True)
+        job["status"] = "failed"
+        job["error"] = f"Payment request failed: {str(e)}"
+        await save_job(state.redis, job_id, job)
+        return None
+
+    job["blockchain_identifier"] = payment_request["data"]["blockchainIdentifier"]
+    job["pay_by_time"] = payment_request["data"]["payByTime"]
+    job["status"] = "awaiting_payment"
+    await save_job(state.redis, job_id, job)
+    logger.info("Created payment request with blockchain identifier: %s", job["blockchain_identifier"])
+    return next_poll_delay(job)
+
+@celery_app.task(name="monitor_payment", **WORKER_TASK_OPTIONS)
+def monitor_payment(job_id: str) -> None:
+    """
+    Checks the job's payment once. Runs the task if it is paid, otherwise
+    re-queues itself, so waiting jobs never hold a worker slot between polls.
+    """
+    delay = run_in_worker_loop(poll_payment(worker_state(), job_id))
+    if delay is not None:
+        monitor_payment.apply_async((job_id,), countdown=delay)
+
+async def cached_payment_index(state, payment: Payment) -> dict:
+    """
+    The network's payment listing indexed by blockchainIdentifier. Every
+    waiting job reads the same listing, so it is fetched once per
+    PAYMENT_LISTING_TTL seconds and shared by all workers through Redis.
+    """
+    key = f"payments:{NETWORK}"
+    cached = await state.redis.get(key)
+    if cached is not None:
+        return json.loads(cached)
+
+    payments = index_payments(await payment.check_payment_status())
+    await state.redis.set(key, json.dumps(payments), ex=PAYMENT_LISTING_TTL)
+    return payments
+
+async def poll_payment(state, job_id: str) -> float | None:
+    """ Returns the delay before the next check, or None once the job no longer waits for payment """
+    job = await load_job(state.redis, job_id)
+    if job is None or job["status"] != "awaiting_payment":
+        return None
+
+    blockchain_identifier = job["blockchain_identifier"]
+    payment = build_payment(state.config, job)
+    try:
+        payments = await cached_payment_index(state, payment)
+    except Exception as e:
+        logger.error("Status check failed for job %s: %s", job_id, e)
+        return next_poll_delay(job)
+
+    entry = payments.get(blockchain_identifier)
+    if entry is None:
+        return next_poll_delay(job)
+
+    on_chain_state = entry.get("onChainState")
+    next_action = entry.get("NextAction", {}).get("requestedAction")
+    if on_chain_state in PAID_ON_CHAIN_STATES or next_action in PAID_NEXT_ACTIONS:
+        await handle_payment_status(state, job_id, blockchain_identifier, payment)
+        return None
+    return next_poll_delay(job)
 
 # ─────────────────────────────────────────────────────────────────────────────
 # Pydantic Models (Corrected for Ad Offers)
@@ -53,6 +335,18 @@ class AdOfferInput(BaseModel):
     bid_amount: str
     ad_content_url: str
 
+    @field_validator("bid_amount")
+    @classmethod
+    def bid_must_be_positive(cls, value: str) -> str:
+        # Validate only; the raw string is kept because it feeds the Masumi input hash
+        try:
+            bid = Decimal(value)
+        except ArithmeticError:
+            raise ValueError("bid_amount must be a decimal number")
+        if not bid.is_finite() or bid <= 0:
+            raise ValueError("bid_amount must be greater than 0")
+        return value
+
 class StartJobRequest(BaseModel):
     identifier_from_purchaser: str
     input_data: AdOfferInput
@@ -69,205 +363,232 @@ class StartJobRequest(BaseModel):
             }
         }
 
+# Response models let FastAPI serialize straight to JSON bytes through pydantic-core
+class AmountOut(BaseModel):
+    model_config = ConfigDict(from_attributes=True)
+
+    amount: str
+    unit: str
+
+class StartJobResponse(BaseModel):
+    job_id: str
+    status: str
+    amounts: list[AmountOut]
+
+class StatusResponse(BaseModel):
+    job_id: str
+    status: str
+    payment_status: str | None
+    blockchainIdentifier: str | None
+    payByTime: str | None
+    result: str | None
+    error: str | None
+
 # ─────────────────────────────────────────────────────────────────────────────
 # Logic: The "Gatekeeper" Function
 # ─────────────────────────────────────────────────────────────────────────────
 # Mock user preferences (In a real app, load this from a DB)
-USER_PREFERENCES = {
-    "interested_categories": ["Technology", "Gaming", "DeFi"],
-    "min_bid": 0.5 
-}
+INTERESTED_CATEGORIES = frozenset({"Technology", "Gaming", "DeFi"})
+MIN_BID = Decimal("0.5")
+
+@functools.lru_cache(maxsize=1024)
+def decide(category: str) -> str:
+    """ Gatekeeper decision for a category; pure, so repeat offers hit the cache """
+    if category not in INTERESTED_CATEGORIES:
+        return f"REJECTED: User is not interested in {category}."
+
+    return f"ACCEPTED: Ad for {category} displayed. User credited."
 
 async def execute_crew_task(input_data: dict) -> str:
     """ 
     Acts as the 'Gatekeeper'. 
     Checks if the Ad Offer matches the User's Preferences. 
     """
-    logger.info(f"Evaluating Ad Offer: {input_data}")
-    
-    # 1. Check Category
+    logger.info("Evaluating Ad Offer: %s", input_data)
+
+    # 1. Check Bid (cheapest rejection first)
+    if Decimal(input_data["bid_amount"]) < MIN_BID:
+        return f"REJECTED: Bid {input_data['bid_amount']} is below the minimum of {MIN_BID}."
+
+    # 2. Check Category
     incoming_category = input_data.get("ad_category")
     
     if not incoming_category:
         return "ERROR: No category provided."
 
-    if incoming_category not in USER_PREFERENCES["interested_categories"]:
-        return f"REJECTED: User is not interested in {incoming_category}."
-
-    return f"ACCEPTED: Ad for {incoming_category} displayed. User credited."
+    return decide(incoming_category)
 
 # ─────────────────────────────────────────────────────────────────────────────
 # 1) Start Job (MIP-003: /start_job)
 # ─────────────────────────────────────────────────────────────────────────────
-@app.post("/start_job")
-async def start_job(data: StartJobRequest):
-    """ Initiates a job and creates a payment request """
-    print(f"Received data: {data}")
-    
+@app.post("/start_job", status_code=202)
+async def start_job(data: StartJobRequest, request: Request, response: Response) -> StartJobResponse:
+    """
+    Accepts a job and queues its payment request. The Masumi round-trip runs
+    in the worker; clients follow the Location header to /status for the
+    blockchain identifier once it exists.
+    """
+    logger.debug("Received data: %s", data)
+
     try:
+        # The job id is the only credential for /status, so it stays fully random
         job_id = str(uuid.uuid4())
         
         # Log the input
-        input_desc = f"Ad Offer: {data.input_data.ad_category}"
-        logger.info(f"Received job request: '{input_desc}'")
-        logger.info(f"Starting job {job_id} with agent {AGENT_IDENTIFIER}")
-
-        # Convert Pydantic model to dict for storage and Masumi SDK
-        input_data_dict = data.input_data.model_dump()
-
-        # Define payment amounts
-        payment_amount = os.getenv("PAYMENT_AMOUNT", "5000000")  # Default 5 ADA
-        payment_unit = os.getenv("PAYMENT_UNIT", "lovelace")
+        logger.info("Received job request: 'Ad Offer: %s'", data.input_data.ad_category)
+        logger.info("Starting job %s with agent %s", job_id, AGENT_IDENTIFIER)
+        logger.info("Using payment amount: %s %s", PAYMENT_AMOUNT, PAYMENT_UNIT)
 
-        # Create Amount Object
-        amounts = [Amount(amount=payment_amount, unit=payment_unit)]
-        logger.info(f"Using payment amount: {payment_amount} {payment_unit}")
-        
-        # Create a payment request using Masumi
-        # --- THIS IS THE CRITICAL FIX: amounts=amounts is included ---
-        payment = Payment(
-            agent_identifier=AGENT_IDENTIFIER,
-            amounts=amounts,
-            config=config,
-            identifier_from_purchaser=data.identifier_from_purchaser,
-            input_data=input_data_dict, 
-            network=NETWORK
-        )
-        
-        logger.info("Creating payment request...")
-        payment_request = await payment.create_payment_request()
-        
-        blockchain_identifier = payment_request["data"]["blockchainIdentifier"]
-        payment.payment_ids.add(blockchain_identifier)
-        logger.info(f"Created payment request with blockchain identifier: {blockchain_identifier}")
-
-        # Store job info (Awaiting payment)
-        jobs[job_id] = {
-            "status": "awaiting_payment",
+        # Store job info (payment request is created by the worker)
+        job = {
+            "status": "creating_payment_request",
             "payment_status": "pending",
-            "blockchain_identifier": blockchain_identifier,
-            "input_data": input_data_dict,
+            "blockchain_identifier": None,
+            "pay_by_time": None,
+            "input_data": data.input_data.model_dump(mode="json"),
             "result": None,
-            "identifier_from_purchaser": data.identifier_from_purchaser
+            "identifier_from_purchaser": data.identifier_from_purchaser,
+            "started_at": time.time()
         }
+        await save_job(request.app.state.redis, job_id, job)
 
-        async def payment_callback(blockchain_identifier: str):
-            await handle_payment_status(job_id, blockchain_identifier)
-
-        # Start monitoring the payment status
-        payment_instances[job_id] = payment
-        logger.info(f"Starting payment status monitoring for job {job_id}")
-        await payment.start_status_monitoring(payment_callback)
-
-        # Return the response
-        return {
-            "status": "success",
-            "job_id": job_id,
-            "blockchainIdentifier": blockchain_identifier,
-            "amounts": amounts, # Included for verification
-            "payByTime": payment_request["data"]["payByTime"],
-        }
+        logger.info("Queueing payment request for job %s", job_id)
+        try:
+            # Publishing to the broker is a blocking socket write; keep it off the event loop
+            await anyio.to_thread.run_sync(create_and_monitor.delay, job_id)
+        except Exception as e:
+            # No worker will ever pick this job up, so don't leave it looking pending
+            job["status"] = "failed"
+            job["error"] = f"Failed to queue job: {str(e)}"
+            await save_job(request.app.state.redis, job_id, job)
+            raise
+
+        response.headers["Location"] = f"/status?job_id={job_id}"
+        return StartJobResponse(
+            job_id=job_id,
+            status="pending",
+            amounts=AMOUNTS, # Included for verification
+        )
     except Exception as e:
-        logger.error(f"Error in start_job: {str(e)}", exc_info=True)
-        raise HTTPException(status_code=400, detail=f"Payment request failed: {str(e)}")
+        logger.error("Error in start_job: %s", e, exc_info=True)
+        raise HTTPException(status_code=500, detail=f"Failed to queue job: {str(e)}")
 
 # ─────────────────────────────────────────────────────────────────────────────
 # 2) Process Payment and Execute Logic
 # ─────────────────────────────────────────────────────────────────────────────
-async def handle_payment_status(job_id: str, payment_id: str) -> None:
+def result_text(result) -> str:
+    """ Text of a task result; CrewAI outputs carry it in .raw, plain results are str()'d """
+    raw = getattr(result, "raw", None)
+    return raw if raw is not None else str(result)
+
+async def handle_payment_status(state, job_id: str, payment_id: str, payment: Payment) -> None:
     """ Executes Task after payment confirmation """
+    job = None
     try:
-        logger.info(f"Payment {payment_id} completed for job {job_id}, executing task...")
-        
+        logger.info("Payment %s completed for job %s, executing task...", payment_id, job_id)
+
+        job = await load_job(state.redis, job_id)
+        if job is None:
+            raise KeyError(f"Job {job_id} expired before payment completed")
+
         # Update job status to running
-        jobs[job_id]["status"] = "running"
-        logger.info(f"Input data: {jobs[job_id]['input_data']}")
+        job["status"] = "running"
+        await save_job(state.redis, job_id, job)
+        logger.info("Input data: %s", job["input_data"])
 
         # Execute the AI task (Gatekeeper Logic)
-        result = await execute_crew_task(jobs[job_id]["input_data"])
-        print(f"Result: {result}")
-        logger.info(f"Task completed for job {job_id}")
+        result = await execute_crew_task(job["input_data"])
+        logger.debug("Result: %s", result)
+        logger.info("Task completed for job %s", job_id)
         
         # Convert result to string
-        result_string = str(result)
+        result_string = result_text(result)
         
         # Mark payment as completed on Masumi
-        await payment_instances[job_id].complete_payment(payment_id, result_string)
-        logger.info(f"Payment completed for job {job_id}")
+        await payment.complete_payment(payment_id, result_string)
+        logger.info("Payment completed for job %s", job_id)
 
         # Update job status
-        jobs[job_id]["status"] = "completed"
-        jobs[job_id]["payment_status"] = "completed"
-        jobs[job_id]["result"] = result
-
-        # Stop monitoring
-        if job_id in payment_instances:
-            payment_instances[job_id].stop_status_monitoring()
-            del payment_instances[job_id]
-            
+        job["status"] = "completed"
+        job["payment_status"] = "completed"
+        job["result"] = result_string
+        await save_job(state.redis, job_id, job)
+
     except Exception as e:
-        print(f"Error processing payment {payment_id} for job {job_id}: {str(e)}")
-        jobs[job_id]["status"] = "failed"
-        jobs[job_id]["error"] = str(e)
-        
-        if job_id in payment_instances:
-            payment_instances[job_id].stop_status_monitoring()
-            del payment_instances[job_id]
+        logger.error("Error processing payment %s for job %s: %s", payment_id, job_id, e, exc_info=True)
+        if job is not None:
+            job["status"] = "failed"
+            job["error"] = str(e)
+            await save_job(state.redis, job_id, job)
 
 # ─────────────────────────────────────────────────────────────────────────────
 # 3) Check Status
 # ─────────────────────────────────────────────────────────────────────────────
 @app.get("/status")
-async def get_status(job_id: str):
-    if job_id not in jobs:
+async def get_status(job_id: str, request: Request, response: Response) -> StatusResponse:
+    state = request.app.state
+    job = await load_job(state.redis, job_id)
+    if job is None:
         raise HTTPException(status_code=404, detail="Job not found")
 
-    job = jobs[job_id]
-
-    # Refresh payment status
-    if job_id in payment_instances:
+    # Refresh payment status while the job is waiting for it
+    if job["status"] == "awaiting_payment":
         try:
-            status = await payment_instances[job_id].check_payment_status()
-            job["payment_status"] = status.get("data", {}).get("status")
-        except:
-            pass
-
-    return {
-        "job_id": job_id,
-        "status": job["status"],
-        "payment_status": job["payment_status"],
-        "result": job.get("result")
-    }
+            on_chain_state = await refresh_payment_status(state, job_id, job)
+            if on_chain_state:
+                job["payment_status"] = on_chain_state
+        except Exception as e:
+            logger.warning("Could not refresh payment status for job %s: %s", job_id, e)
+
+    # Let clients and proxies absorb polling storms
+    response.headers["Cache-Control"] = f"public, max-age={STATUS_CACHE_TTL}"
+
+    return StatusResponse(
+        job_id=job_id,
+        status=job["status"],
+        payment_status=job["payment_status"],
+        blockchainIdentifier=job.get("blockchain_identifier"),
+        payByTime=job.get("pay_by_time"),
+        result=job.get("result"),
+        error=job.get("error")
+    )
 
 # ─────────────────────────────────────────────────────────────────────────────
 # 4) Availability & Schema
 # ─────────────────────────────────────────────────────────────────────────────
+# These responses never change, so they are serialized once at import
+AVAILABILITY_BYTES = orjson.dumps({"status": "available", "type": "masumi-agent", "message": "Server operational."})
+
+INPUT_SCHEMA_BYTES = orjson.dumps({
+    "input_data": [
+        {
+            "id": "ad_category",
+            "type": "string",
+            "name": "Ad Category",
+            "data": {"description": "e.g., Technology", "placeholder": "Technology"}
+        },
+        {
+            "id": "ad_content_url",
+            "type": "string",
+            "name": "Ad Content URL",
+            "data": {"description": "IPFS Link", "placeholder": "https://..."}
+        }
+    ]
+})
+
+HEALTH_BYTES = orjson.dumps({"status": "healthy"})
+
 @app.get("/availability")
 async def check_availability():
-    return {"status": "available", "type": "masumi-agent", "message": "Server operational."}
+    return Response(AVAILABILITY_BYTES, media_type="application/json")
 
 @app.get("/input_schema")
 async def input_schema():
-    return {
-        "input_data": [
-            {
-                "id": "ad_category",
-                "type": "string",
-                "name": "Ad Category",
-                "data": {"description": "e.g., Technology", "placeholder": "Technology"}
-            },
-            {
-                "id": "ad_content_url",
-                "type": "string",
-                "name": "Ad Content URL",
-                "data": {"description": "IPFS Link", "placeholder": "https://..."}
-            }
-        ]
-    }
+    return Response(INPUT_SCHEMA_BYTES, media_type="application/json")
 
 @app.get("/health")
 async def health():
-    return {"status": "healthy"}
+    return Response(HEALTH_BYTES, media_type="application/json")
 
 # ─────────────────────────────────────────────────────────────────────────────
 # Main Runner (PORT 8001)
@@ -276,4 +597,14 @@ if __name__ == "__main__":
     print("\n" + "=" * 70)
     print("🔥🔥🔥 I AM THE NEW CODE ON PORT 8001 🔥🔥🔥")
     print("=" * 70 + "\n")
-    uvicorn.run(app, host="127.0.0.1", port=8001, log_level="info")
\ No newline at end of file
+    uvicorn.run(
+        "main:app",
+        host=os.getenv("HOST", "127.0.0.1"),
+        port=int(os.getenv("PORT", "8001")),
+        workers=int(os.getenv("UVICORN_WORKERS", "4")),
+        loop=os.getenv("UVICORN_LOOP", "uvloop"),
+        http=os.getenv("UVICORN_HTTP", "httptools"),
+        limit_concurrency=int(os.getenv("UVICORN_LIMIT", "1024")),
+        backlog=int(os.getenv("UVICORN_BACKLOG", "2048")),
+        log_level="info"
+    )
\ No newline at end of file
@@ -0,0 +1,218 @@
+import asyncio
+import json
+from types import SimpleNamespace
+from unittest import mock
+
+import pytest
+from fastapi.testclient import TestClient
+
+import main
+
+
+class FakeRedis:
+    """ Minimal stand-in for the redis.asyncio client calls main.py makes """
+    def __init__(self):
+        self.data = {}
+
+    async def get(self, key):
+        return self.data.get(key)
+
+    async def set(self, key, value, ex=None):
+        self.data[key] = value
+
+    async def ping(self):
+        return True
+
+    async def aclose(self):
+        pass
+
+
+@pytest.fixture
+def redis():
+    return FakeRedis()
+
+
+@pytest.fixture
+def client(redis):
+    # Run the real lifespan against the fake Redis; the Masumi config is not needed here
+    with mock.patch.object(main.Redis, "from_url", return_value=redis), \
+            mock.patch.object(main, "build_config", return_value=mock.Mock()), \
+            mock.patch.object(main, "prewarm", mock.AsyncMock()), \
+            mock.patch.object(main.create_and_monitor, "delay"):
+        with TestClient(main.app) as c:
+            yield c
+    for name in ("config", "redis", "status_batcher"):
+        delattr(main.app.state, name)
+
+
+@pytest.mark.parametrize("bid_amount", ["5.0", "5", "05", " 5", "1e1"])
+def test_start_job_stores_input_data_verbatim(client, redis, bid_amount):
+    # The stored input_data feeds the Masumi input hash, so it must match what was sent
+    input_data = {
+        "ad_category": "Technology",
+        "bid_amount": bid_amount,
+        "ad_content_url": "https://ipfs.io/ipfs/example",
+    }
+    response = client.post("/start_job", json={
+        "identifier_from_purchaser": "1234567890abcdef12345678",
+        "input_data": input_data,
+    })
+    assert response.status_code == 202
+
+    job = json.loads(redis.data[f"job:{response.json()['job_id']}"])
+    assert job["input_data"] == input_data
+
+
+@pytest.mark.parametrize("bid_amount", [5, "0", "-1", "abc", "NaN"])
+def test_start_job_rejects_invalid_bids(client, bid_amount):
+    response = client.post("/start_job", json={
+        "identifier_from_purchaser": "1234567890abcdef12345678",
+        "input_data": {
+            "ad_category": "Technology",
+            "bid_amount": bid_amount,
+            "ad_content_url": "https://ipfs.io/ipfs/example",
+        },
+    })
+    assert response.status_code == 422
+
+
+def test_start_job_marks_job_failed_when_queueing_fails(client, redis):
+    main.create_and_monitor.delay.side_effect = ConnectionError("broker down")
+    response = client.post("/start_job", json={
+        "identifier_from_purchaser": "1234567890abcdef12345678",
+        "input_data": {
+            "ad_category": "Technology",
+            "bid_amount": "5.0",
+            "ad_content_url": "https://ipfs.io/ipfs/example",
+        },
+    })
+    assert response.status_code == 500
+
+    [record] = redis.data.values()
+    job = json.loads(record)
+    assert job["status"] == "failed"
+    assert "broker down" in job["error"]
+
+
+def make_job(status, **fields):
+    job = {
+        "status": status,
+        "payment_status": "pending",
+        "blockchain_identifier": None,
+        "pay_by_time": None,
+        "input_data": {
+            "ad_category": "Technology",
+            "bid_amount": "5.0",
+            "ad_content_url": "https://ipfs.io/ipfs/example",
+        },
+        "result": None,
+        "identifier_from_purchaser": "1234567890abcdef12345678",
+        "started_at": main.time.time(),
+    }
+    job.update(fields)
+    return job
+
+
+def listing(blockchain_identifier, on_chain_state):
+    return {"data": {"Payments": [{
+        "blockchainIdentifier": blockchain_identifier,
+        "onChainState": on_chain_state,
+        "NextAction": {"requestedAction": "WaitingForExternalAction"},
+    }]}}
+
+
+@pytest.fixture
+def worker(redis):
+    return SimpleNamespace(config=mock.Mock(), redis=redis)
+
+
+@pytest.fixture
+def payment():
+    payment = mock.Mock()
+    payment.create_payment_request = mock.AsyncMock()
+    payment.check_payment_status = mock.AsyncMock()
+    payment.complete_payment = mock.AsyncMock()
+    with mock.patch.object(main, "build_payment", return_value=payment):
+        yield payment
+
+
+def stored(redis, job_id):
+    return json.loads(redis.data[f"job:{job_id}"])
+
+
+@pytest.mark.parametrize("elapsed, expected", [(0, 0.5), (600, 30.0), (86400, main.PAYMENT_POLL_MAX_INTERVAL)])
+def test_next_poll_delay_grows_with_age(elapsed, expected):
+    job = {"started_at": main.time.time() - elapsed}
+    assert main.next_poll_delay(job) == pytest.approx(expected, abs=0.01)
+
+
+def test_request_payment_moves_job_to_awaiting_payment(worker, redis, payment):
+    asyncio.run(main.save_job(redis, "job", make_job("creating_payment_request")))
+    payment.create_payment_request.return_value = {
+        "data": {"blockchainIdentifier": "bc-1", "payByTime": "2026-01-01T00:00:00.000Z"}
+    }
+
+    delay = asyncio.run(main.request_payment(worker, "job"))
+
+    assert delay is not None
+    job = stored(redis, "job")
+    assert job["status"] == "awaiting_payment"
+    assert job["blockchain_identifier"] == "bc-1"
+
+
+def test_request_payment_failure_marks_job_failed(worker, redis, payment):
+    asyncio.run(main.save_job(redis, "job", make_job("creating_payment_request")))
+    payment.create_payment_request.side_effect = RuntimeError("service down")
+
+    assert asyncio.run(main.request_payment(worker, "job")) is None
+
+    job = stored(redis, "job")
+    assert job["status"] == "failed"
+    assert "service down" in job["error"]
+
+
+def test_poll_payment_completes_paid_job(worker, redis, payment):
+    asyncio.run(main.save_job(redis, "job", make_job("awaiting_payment", blockchain_identifier="bc-1")))
+    payment.check_payment_status.return_value = listing("bc-1", "FundsLocked")
+
+    assert asyncio.run(main.poll_payment(worker, "job")) is None
+
+    job = stored(redis, "job")
+    assert job["status"] == "completed"
+    assert job["result"].startswith("ACCEPTED")
+    payment.complete_payment.assert_awaited_once_with("bc-1", job["result"])
+
+
+def test_monitor_payment_requeues_unpaid_job(worker, redis, payment):
+    asyncio.run(main.save_job(redis, "job", make_job("awaiting_payment", blockchain_identifier="bc-1")))
+    payment.check_payment_status.return_value = listing("bc-1", None)
+
+    with mock.patch.object(main, "worker_state", return_value=worker), \
+            mock.patch.object(main.monitor_payment, "apply_async") as apply_async:
+        main.monitor_payment("job")
+
+    apply_async.assert_called_once()
+    assert apply_async.call_args.kwargs["countdown"] > 0
+    assert stored(redis, "job")["status"] == "awaiting_payment"
+    payment.complete_payment.assert_not_awaited()
+
+
+def test_status_reports_job_error(client, redis):
+    asyncio.run(main.save_job(redis, "job", make_job("failed", error="Payment request failed: service down")))
+
+    response = client.get("/status", params={"job_id": "job"})
+
+    assert response.status_code == 200
+    assert response.json()["error"] == "Payment request failed: service down"
+
+
+def test_poll_payment_shares_one_listing_across_jobs(worker, redis, payment):
+    for job_id, blockchain_identifier in (("a", "bc-a"), ("b", "bc-b")):
+        job = make_job("awaiting_payment", blockchain_identifier=blockchain_identifier)
+        asyncio.run(main.save_job(redis, job_id, job))
+    payment.check_payment_status.return_value = listing("bc-a", None)
+
+    asyncio.run(main.poll_payment(worker, "a"))
+    asyncio.run(main.poll_payment(worker, "b"))
+
+    payment.check_payment_status.assert_awaited_once()